@@ -1,15 +1,6 @@
 import pydantic
 
 
-class RAGChunkAndSrc(pydantic.BaseModel):
-    chunks: list[str]
-    source_id: str = None
-    # Images aligned to chunks: each entry is a list of image URLs for the corresponding chunk
-    images: list[list[str]] = pydantic.Field(default_factory=list)
-    guide_title: str | None = None
-    guide_url: str | None = None
-
-
 class RAGUpsertResult(pydantic.BaseModel):
     ingested: int
 
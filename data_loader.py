@@ -1,24 +1,213 @@
 import boto3
-import json
-from llama_index.core.node_parser import SentenceSplitter
+import botocore.config
+import functools
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+import numpy as np
+import orjson
+import regex
 from dotenv import load_dotenv
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 from typing import List, Dict, Optional, Tuple, TypedDict
 
 load_dotenv()
 
-bedrock_runtime = boto3.client(
-    service_name='bedrock-runtime',
-    region_name='us-east-1'
-)
+@functools.cache
+def _bedrock():
+    """Runtime Bedrock client, built on first embedding call.
+
+    botocore clients are thread-safe, so the single instance with a
+    widened connection pool serves the concurrent embedding calls below.
+    Lazy construction keeps module import (and FastAPI cold start on
+    pure chat paths) from paying for boto3 session setup.
+    """
+    return boto3.client(
+        service_name='bedrock-runtime',
+        region_name='us-east-1',
+        config=botocore.config.Config(
+            max_pool_connections=32,
+            retries={"max_attempts": 5, "mode": "adaptive"},
+        )
+    )
+
+
 EMBED_MODEL = "amazon.titan-embed-text-v2:0"
 EMBED_DIM = 1024
+EMBED_MAX_WORKERS = 16
+
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "embed_cache.db")
+EMBED_MEM_CACHE_MAX = 50000
+
+# Site-scale ingests can route embedding through an S3-backed Bedrock
+# batch job instead of per-chunk invocations; requires both settings.
+EMBED_BATCH_S3_URI = os.getenv("EMBED_BATCH_S3_URI", "").rstrip("/")
+EMBED_BATCH_ROLE_ARN = os.getenv("EMBED_BATCH_ROLE_ARN", "")
+EMBED_BATCH_MIN_CHUNKS = int(os.getenv("EMBED_BATCH_MIN_CHUNKS", "1000"))
+EMBED_BATCH_POLL_S = 30
+
+
+@functools.cache
+def _bedrock_control():
+    """Control-plane Bedrock client (batch job management)."""
+    return boto3.client(service_name='bedrock', region_name='us-east-1')
+
+
+@functools.cache
+def _s3():
+    return boto3.client('s3')
+
+_embed_cache_lock = threading.Lock()
+_embed_cache_conn: Optional[sqlite3.Connection] = None
+# Hot in-memory layer on top of the SQLite cache, keyed by sha256(text)
+_embed_mem_cache: Dict[bytes, np.ndarray] = {}
+
+
+def _embed_cache() -> sqlite3.Connection:
+    """Open (once) the persistent sha256(text) -> vector cache."""
+    global _embed_cache_conn
+    if _embed_cache_conn is None:
+        conn = sqlite3.connect(EMBED_CACHE_PATH, check_same_thread=False)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embed_cache "
+            "(model TEXT, key BLOB, vec BLOB, PRIMARY KEY (model, key))"
+        )
+        conn.commit()
+        _embed_cache_conn = conn
+    return _embed_cache_conn
+
+
+def _embed_cache_get(keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+    """Look up cached vectors for the given keys in one query."""
+    found: Dict[bytes, np.ndarray] = {}
+    pending = []
+    for key in keys:
+        vec = _embed_mem_cache.get(key)
+        if vec is not None:
+            found[key] = vec
+        else:
+            pending.append(key)
+    if pending:
+        conn = _embed_cache()
+        placeholders = ",".join("?" * len(pending))
+        rows = conn.execute(
+            f"SELECT key, vec FROM embed_cache WHERE model = ? AND key IN ({placeholders})",
+            [EMBED_MODEL, *pending],
+        ).fetchall()
+        for key, blob in rows:
+            found[key] = np.frombuffer(blob, dtype=np.float32)
+    return found
+
+
+def _embed_cache_put(entries: Dict[bytes, np.ndarray]) -> None:
+    """Persist freshly computed vectors and refresh the in-memory layer."""
+    if not entries:
+        return
+    conn = _embed_cache()
+    conn.executemany(
+        "INSERT OR REPLACE INTO embed_cache (model, key, vec) VALUES (?, ?, ?)",
+        [(EMBED_MODEL, key, vec.tobytes()) for key, vec in entries.items()],
+    )
+    conn.commit()
+    for key, vec in entries.items():
+        if len(_embed_mem_cache) >= EMBED_MEM_CACHE_MAX:
+            _embed_mem_cache.pop(next(iter(_embed_mem_cache)))
+        _embed_mem_cache[key] = vec
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+# Sentence boundaries, with newlines as a fallback boundary: guide text
+# from extract_guide_text is largely bulleted lines without terminal
+# punctuation, and those still have to respect the chunk budget
+_SENT_RE = regex.compile(r'(?<=[.!?])\s+|\n+')
+
+
+@functools.cache
+def _splitter():
+    """Build the sentence splitter on first use.
+
+    Importing llama_index and its tokenizer is expensive; sections under
+    the chunk size never need it.
+    """
+    from llama_index.core.node_parser import SentenceSplitter
+    return SentenceSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+
+def _fast_split(section: str) -> List[str]:
+    """Greedily pack regex-split sentences into ~CHUNK_SIZE chunks.
+
+    Equivalent in shape to SentenceSplitter output for plain guide text,
+    without invoking its tokenizer: split on sentence boundaries, fill
+    each chunk to the size budget, and carry ~CHUNK_OVERLAP characters of
+    trailing sentences into the next chunk.
+    """
+    sentences = _SENT_RE.split(section)
+    chunks: List[str] = []
+    current: List[str] = []
+    current_len = 0
+    for sentence in sentences:
+        if current and current_len + 1 + len(sentence) > CHUNK_SIZE:
+            chunks.append(" ".join(current))
+            overlap: List[str] = []
+            overlap_len = 0
+            for prev in reversed(current):
+                if overlap_len + len(prev) + 1 > CHUNK_OVERLAP:
+                    break
+                overlap.insert(0, prev)
+                overlap_len += len(prev) + 1
+            current = overlap
+            current_len = overlap_len
+        current.append(sentence)
+        current_len += len(sentence) + 1
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def _split_section(section: str) -> List[str]:
+    """Split an oversize section, preferring the compiled fast path.
+
+    Guide text is overwhelmingly ASCII; non-ASCII sections fall back to
+    SentenceSplitter, whose tokenizer handles them more carefully. The
+    same fallback applies when the fast path can't stay within the size
+    budget — a section with no sentence or line boundary at all — since
+    SentenceSplitter force-splits on words as a last resort.
+    """
+    if section.isascii():
+        chunks = _fast_split(section)
+        if all(len(chunk) <= CHUNK_SIZE for chunk in chunks):
+            return chunks
+    return _splitter().split_text(section)
 
-splitter = SentenceSplitter(chunk_size=1000, chunk_overlap=200)
 
 DOZUKI_BASE_URL = "https://hansaw.dozuki.com"
 DOZUKI_APP_ID = "9c9e0e7ae61d3a70bfe4debb87ad145a"
 
+# (connect, read) timeout so a stuck Dozuki call can't hang an ingest
+REQUEST_TIMEOUT = (5, 30)
+
+# Pooled session with keep-alive: avoids a fresh TCP+TLS handshake per
+# request when ingesting thousands of guides.
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(
+    pool_connections=50,
+    pool_maxsize=50,
+    max_retries=Retry(
+        total=5,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+    ),
+))
+
 
 def authenticate_dozuki(email: str, password: str) -> Optional[str]:
     """Authenticate with Dozuki API and return the token."""
@@ -32,7 +221,8 @@ def authenticate_dozuki(email: str, password: str) -> Optional[str]:
         "password": password
     }
 
-    response = requests.post(url, headers=headers, json=data)
+    response = _session.post(url, headers=headers,
+                             json=data, timeout=REQUEST_TIMEOUT)
 
     if response.status_code == 201:
         return response.json().get("authToken")
@@ -49,7 +239,32 @@ def fetch_guide(guide_id: int, token: str) -> Dict:
         "Authorization": f"api {token}"
     }
 
-    response = requests.get(url, headers=headers)
+    response = _session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+
+    if response.status_code == 200:
+        return response.json()
+    else:
+        raise Exception(
+            f"Failed to fetch guide: {response.status_code} - {response.text}")
+
+
+def make_async_client() -> httpx.AsyncClient:
+    """Create an httpx client sized for fanning out Dozuki API calls."""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=50),
+        timeout=30.0,
+    )
+
+
+async def fetch_guide_async(client: httpx.AsyncClient, guide_id: int, token: str) -> Dict:
+    """Fetch a guide from Dozuki API using a shared async client."""
+    url = f"{DOZUKI_BASE_URL}/api/2.0/guides/{guide_id}"
+    headers = {
+        "X-App-Id": DOZUKI_APP_ID,
+        "Authorization": f"api {token}"
+    }
+
+    response = await client.get(url, headers=headers)
 
     if response.status_code == 200:
         return response.json()
@@ -83,11 +298,15 @@ def extract_guide_text(guide_data: Dict) -> List[str]:
         step_title = step.get("title", "")
         step_lines = step.get("lines", [])
 
-        step_text = f"Step {step.get('orderby', '')}: {step_title}\n"
-        for line in step_lines:
-            line_text = line.get("text_rendered", "")
-            if line_text:
-                step_text += f"- {line_text}\n"
+        # Build via list + join: += string concatenation is quadratic
+        # over steps with many lines
+        step_parts = [f"Step {step.get('orderby', '')}: {step_title}"]
+        step_parts.extend(
+            f"- {line_text}"
+            for line in step_lines
+            if (line_text := line.get("text_rendered", ""))
+        )
+        step_text = "\n".join(step_parts)
 
         if step_text.strip():
             text_chunks.append(step_text)
@@ -100,18 +319,16 @@ def extract_guide_text(guide_data: Dict) -> List[str]:
     # Extract parts if present
     parts = guide_data.get("parts", [])
     if parts:
-        parts_text = "Required Parts:\n"
-        for part in parts:
-            parts_text += f"- {part.get('text', '')}\n"
-        text_chunks.append(parts_text)
+        parts_lines = ["Required Parts:"]
+        parts_lines.extend(f"- {part.get('text', '')}" for part in parts)
+        text_chunks.append("\n".join(parts_lines))
 
     # Extract tools if present
     tools = guide_data.get("tools", [])
     if tools:
-        tools_text = "Required Tools:\n"
-        for tool in tools:
-            tools_text += f"- {tool.get('text', '')}\n"
-        text_chunks.append(tools_text)
+        tools_lines = ["Required Tools:"]
+        tools_lines.extend(f"- {tool.get('text', '')}" for tool in tools)
+        text_chunks.append("\n".join(tools_lines))
 
     return text_chunks
 
@@ -179,7 +396,8 @@ def fetch_guide_list(token: str, offset: int = 0, limit: int = 200) -> List[Dict
         "limit": limit
     }
 
-    response = requests.get(url, headers=headers, params=params)
+    response = _session.get(url, headers=headers,
+                            params=params, timeout=REQUEST_TIMEOUT)
 
     if response.status_code == 200:
         # The API returns an array of guide summaries directly
@@ -197,8 +415,8 @@ def load_and_chunk_guide(guide_id: int, token: str) -> List[str]:
     # Split larger sections into smaller chunks
     chunks = []
     for section in text_sections:
-        if len(section) > 1000:
-            chunks.extend(splitter.split_text(section))
+        if len(section) > CHUNK_SIZE:
+            chunks.extend(_split_section(section))
         else:
             chunks.append(section)
 
@@ -210,13 +428,12 @@ class GuideMeta(TypedDict, total=False):
     guide_url: str
 
 
-def load_and_chunk_guide_with_media(guide_id: int, token: str) -> Tuple[List[str], List[List[str]], GuideMeta]:
-    """Load a guide and produce (chunks, images_per_chunk).
+def chunk_guide_with_media(guide_data: Dict) -> Tuple[List[str], List[List[str]], GuideMeta]:
+    """Chunk already-fetched guide data into (chunks, images_per_chunk, meta).
 
     For sections that exceed the chunk size, the same set of section images
     is associated with each resulting sub-chunk.
     """
-    guide_data = fetch_guide(guide_id, token)
     text_sections = extract_guide_text(guide_data)
     image_sections = extract_guide_images(guide_data)
     meta: GuideMeta = {}
@@ -236,8 +453,8 @@ def load_and_chunk_guide_with_media(guide_id: int, token: str) -> Tuple[List[str
 
     for idx, section in enumerate(text_sections):
         images = image_sections[idx] if idx < len(image_sections) else []
-        if len(section) > 1000:
-            parts = splitter.split_text(section)
+        if len(section) > CHUNK_SIZE:
+            parts = _split_section(section)
             for part in parts:
                 chunks.append(part)
                 # Reuse the same images for each split part of the same section
@@ -249,24 +466,151 @@ def load_and_chunk_guide_with_media(guide_id: int, token: str) -> Tuple[List[str
     return chunks, chunk_images, meta
 
 
-def embed_texts(texts: List[str]) -> List[List[float]]:
-    """Generate embeddings for text chunks using AWS Bedrock Titan Embed v2."""
-    embeddings = []
-    for text in texts:
-        body = json.dumps({
-            "inputText": text,
-            "dimensions": EMBED_DIM,
-            "normalize": True
+def load_and_chunk_guide_with_media(guide_id: int, token: str) -> Tuple[List[str], List[List[str]], GuideMeta]:
+    """Load a guide from Dozuki API and chunk it with aligned images."""
+    guide_data = fetch_guide(guide_id, token)
+    return chunk_guide_with_media(guide_data)
+
+
+def _embed_one(text: str) -> np.ndarray:
+    """Embed a single chunk via Bedrock Titan Embed v2."""
+    body = orjson.dumps({
+        "inputText": text,
+        "dimensions": EMBED_DIM,
+        "normalize": True
+    })
+
+    response = _bedrock().invoke_model(
+        modelId=EMBED_MODEL,
+        body=body,
+        contentType='application/json',
+        accept='application/json'
+    )
+
+    # orjson parses the ~15KB of ASCII floats markedly faster than stdlib
+    # json, and float32 avoids boxing 1024 Python floats per vector
+    response_body = orjson.loads(response['body'].read())
+    return np.asarray(response_body['embedding'], dtype=np.float32)
+
+
+def embed_texts_batch(texts: List[str]) -> np.ndarray:
+    """Embed texts via one S3-backed Bedrock model-invocation job.
+
+    Writes all chunks as JSONL to S3, submits a batch job, polls until it
+    finishes, and reads the embeddings back — one job instead of tens of
+    thousands of per-chunk invocations. Minutes of job latency make this
+    worthwhile only at site-ingest scale; embed_texts gates on
+    EMBED_BATCH_MIN_CHUNKS.
+    """
+    bucket, _, prefix = EMBED_BATCH_S3_URI.removeprefix("s3://").partition("/")
+    job_name = f"embed-batch-{uuid4().hex}"
+    input_key = f"{prefix}/{job_name}/input.jsonl".lstrip("/")
+    output_prefix = f"{prefix}/{job_name}/output/".lstrip("/")
+
+    records = b"\n".join(
+        orjson.dumps({
+            "recordId": str(i),
+            "modelInput": {
+                "inputText": text,
+                "dimensions": EMBED_DIM,
+                "normalize": True,
+            },
         })
+        for i, text in enumerate(texts)
+    )
+    _s3().put_object(Bucket=bucket, Key=input_key, Body=records)
+
+    job_arn = _bedrock_control().create_model_invocation_job(
+        jobName=job_name,
+        modelId=EMBED_MODEL,
+        roleArn=EMBED_BATCH_ROLE_ARN,
+        inputDataConfig={
+            "s3InputDataConfig": {"s3Uri": f"s3://{bucket}/{input_key}"}},
+        outputDataConfig={
+            "s3OutputDataConfig": {"s3Uri": f"s3://{bucket}/{output_prefix}"}},
+    )["jobArn"]
+
+    while True:
+        status = _bedrock_control().get_model_invocation_job(
+            jobIdentifier=job_arn)["status"]
+        if status == "Completed":
+            break
+        if status in ("Failed", "Stopped", "Expired"):
+            raise Exception(
+                f"Embedding batch job {job_name} ended with status {status}")
+        time.sleep(EMBED_BATCH_POLL_S)
+
+    out = np.empty((len(texts), EMBED_DIM), dtype=np.float32)
+    # np.empty rows are uninitialized memory; track what the job output
+    # actually covered so a partial result can never be upserted
+    filled = np.zeros(len(texts), dtype=bool)
+    failed = []
+    listing = _s3().list_objects_v2(Bucket=bucket, Prefix=output_prefix)
+    for obj in listing.get("Contents", []):
+        if not obj["Key"].endswith(".jsonl.out"):
+            continue
+        body = _s3().get_object(Bucket=bucket, Key=obj["Key"])["Body"].read()
+        for line in body.splitlines():
+            if not line:
+                continue
+            record = orjson.loads(line)
+            idx = int(record["recordId"])
+            model_output = record.get("modelOutput")
+            if model_output is None:
+                # Per-record failures carry an error instead of modelOutput
+                failed.append(idx)
+                continue
+            out[idx] = model_output["embedding"]
+            filled[idx] = True
+    if failed:
+        raise Exception(
+            f"Embedding batch job {job_name} reported errors for "
+            f"{len(failed)} of {len(texts)} records "
+            f"(first failed recordId: {min(failed)})")
+    missing = np.flatnonzero(~filled)
+    if missing.size:
+        raise Exception(
+            f"Embedding batch job {job_name} returned no output for "
+            f"{missing.size} of {len(texts)} records "
+            f"(first missing recordId: {missing[0]})")
+    return out
 
-        response = bedrock_runtime.invoke_model(
-            modelId=EMBED_MODEL,
-            body=body,
-            contentType='application/json',
-            accept='application/json'
-        )
 
-        response_body = json.loads(response['body'].read())
-        embeddings.append(response_body['embedding'])
+def embed_texts(texts: List[str]) -> np.ndarray:
+    """Generate embeddings for text chunks using AWS Bedrock Titan Embed v2.
 
-    return embeddings
+    Titan has no batch endpoint, so chunks are dispatched concurrently;
+    executor.map preserves input order. Vectors are cached by content hash
+    so identical chunks (shared headers, tool lists, re-ingests) skip the
+    Bedrock round trip entirely. Returns a float32 array of shape (N, dim).
+    """
+    if not texts:
+        return np.empty((0, EMBED_DIM), dtype=np.float32)
+    # Fill one contiguous (N, dim) float32 block in place: SoA layout the
+    # Qdrant client can consume without reboxing per-float
+    out = np.empty((len(texts), EMBED_DIM), dtype=np.float32)
+    keys = [hashlib.sha256(text.encode()).digest() for text in texts]
+    with _embed_cache_lock:
+        cached = _embed_cache_get(keys)
+    miss_indices = []
+    for i, key in enumerate(keys):
+        vec = cached.get(key)
+        if vec is None:
+            miss_indices.append(i)
+        else:
+            out[i, :] = vec
+    if miss_indices:
+        miss_texts = [texts[i] for i in miss_indices]
+        if (EMBED_BATCH_S3_URI and EMBED_BATCH_ROLE_ARN
+                and len(miss_texts) >= EMBED_BATCH_MIN_CHUNKS):
+            miss_vecs = embed_texts_batch(miss_texts)
+        else:
+            with ThreadPoolExecutor(max_workers=min(EMBED_MAX_WORKERS, len(miss_indices))) as executor:
+                miss_vecs = list(executor.map(_embed_one, miss_texts))
+        for i, vec in zip(miss_indices, miss_vecs):
+            out[i, :] = vec
+        with _embed_cache_lock:
+            # copy(): out[i] is a view that would pin the whole (N, dim)
+            # block in the in-memory cache for the life of one row
+            _embed_cache_put({keys[i]: out[i].copy() for i in miss_indices})
+    return out
@@ -0,0 +1,53 @@
+import threading
+from typing import Any, Hashable, Optional
+
+import numpy as np
+
+
+class SemanticQueryCache:
+    """In-memory cache of past query embeddings mapped to prior results.
+
+    Query vectors are normalized (Titan is called with normalize=True), so
+    cosine similarity reduces to one matrix-vector dot product per lookup.
+    A new query whose similarity to a cached query exceeds the threshold
+    reuses the cached result, short-circuiting the whole RAG pipeline.
+
+    Entries are partitioned by a scope key (e.g. guide_id or None for
+    site-wide) so guide-scoped answers never leak across scopes.
+    """
+
+    def __init__(self, dim: int = 1024, threshold: float = 0.95, max_entries: int = 10000):
+        self.dim = dim
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # scope -> (matrix of shape (N, dim), list of N cached results)
+        self._scopes: dict[Hashable, tuple[np.ndarray, list[Any]]] = {}
+
+    def get(self, query_vec, scope: Hashable = None) -> Optional[Any]:
+        """Return the cached result for the nearest query above threshold."""
+        vec = np.asarray(query_vec, dtype=np.float32)
+        with self._lock:
+            entry = self._scopes.get(scope)
+            if entry is None:
+                return None
+            matrix, results = entry
+            sims = matrix @ vec
+            best = int(np.argmax(sims))
+            if sims[best] >= self.threshold:
+                return results[best]
+            return None
+
+    def put(self, query_vec, scope: Hashable, result: Any) -> None:
+        """Record a query embedding and its result, evicting oldest first."""
+        row = np.asarray(query_vec, dtype=np.float32).reshape(1, self.dim)
+        with self._lock:
+            entry = self._scopes.get(scope)
+            if entry is None:
+                self._scopes[scope] = (row, [result])
+                return
+            matrix, results = entry
+            if len(results) >= self.max_entries:
+                matrix = matrix[1:]
+                results = results[1:]
+            self._scopes[scope] = (np.vstack([matrix, row]), results + [result])
@@ -1,28 +1,37 @@
 import asyncio
+import re
+import threading
 import time
 
+import orjson
 import streamlit as st
 import inngest
 from dotenv import load_dotenv
 import os
 import requests
+from requests.adapters import HTTPAdapter
 from data_loader import authenticate_dozuki
 from vector_db import QdrantStorage
 
 load_dotenv()
 
 
+@st.cache_resource(show_spinner=False)
+def _event_loop() -> asyncio.AbstractEventLoop:
+    """One background event loop shared by every Streamlit rerun.
+
+    Creating and installing a loop per interaction is expensive (and
+    deprecated on non-main threads); a daemon thread keeps this one
+    running so the cached Inngest client can also reuse its connections.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+
 def run_async(coro):
     """Helper to run async functions in Streamlit."""
-    try:
-        loop = asyncio.get_event_loop()
-        if loop.is_closed():
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-    return loop.run_until_complete(coro)
+    return asyncio.run_coroutine_threadsafe(coro, _event_loop()).result()
 
 
 st.set_page_config(page_title="RAG Dozuki Guide Manager",
@@ -34,33 +43,112 @@ def get_inngest_client() -> inngest.Inngest:
     return inngest.Inngest(app_id="rag_app", is_production=False)
 
 
+@st.cache_resource
+def _qdrant_storage() -> QdrantStorage:
+    """One Qdrant client for the whole session.
+
+    Streamlit reruns the script on every widget interaction; constructing
+    QdrantStorage per call would redo the TCP/gRPC handshake each rerun.
+    """
+    return QdrantStorage()
+
+
+@st.cache_resource
+def _http_session() -> requests.Session:
+    """Pooled HTTP session for polling the Inngest dev server.
+
+    Keepalive avoids a fresh TCP connection per poll — the progress loops
+    hit the API several times a second.
+    """
+    session = requests.Session()
+    session.mount(
+        "http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+    return session
+
+
 def _inngest_api_base() -> str:
     return os.getenv("INNGEST_API_BASE", "http://127.0.0.1:8288/v1")
 
 
+@st.cache_data(ttl=30.0, show_spinner=False)
 def get_document_count() -> int:
+    """Point count from Qdrant, cached so the dev tab doesn't trigger a
+    round-trip on every widget interaction anywhere in the app."""
     try:
-        with QdrantStorage() as storage:
-            return storage.count()
+        return _qdrant_storage().count()
     except Exception:
         return 0
 
 
-def fetch_runs(event_id: str) -> list[dict]:
+def _fetch_runs_uncached(event_id: str) -> list[dict]:
     url = f"{_inngest_api_base()}/events/{event_id}/runs"
-    resp = requests.get(url)
+    resp = _http_session().get(url, timeout=5)
     resp.raise_for_status()
-    data = resp.json()
+    data = orjson.loads(resp.content)
     return data.get("data", [])
 
 
+@st.cache_data(ttl=1.0, show_spinner=False)
+def fetch_runs(event_id: str) -> list[dict]:
+    # Rerun-driven callers (the site-progress block) go through this TTL
+    # cache; wait_for_run_output polls sub-second and uses the uncached
+    # variant directly
+    return _fetch_runs_uncached(event_id)
+
+
+@st.cache_data(ttl=1.0, show_spinner=False)
+def _fetch_site_progress_events(site_id: str) -> list[dict]:
+    """Recent rag/site_progress events for a site.
+
+    The short TTL serves widget-triggered reruns from memory instead of
+    re-hitting the Inngest API within the same poll window.
+    """
+    url = f"{_inngest_api_base()}/events?name=rag/site_progress"
+    resp = _http_session().get(url, timeout=5)
+    resp.raise_for_status()
+    events = orjson.loads(resp.content).get("data", [])
+    return [e for e in events if e.get("data", {}).get("site_id") == site_id]
+
+
+def _apply_progress_events(events: list[dict], progress: dict,
+                           seen_ids: set) -> None:
+    """Fold recent site-progress events into the progress dict.
+
+    The Inngest /events endpoint returns recent events, not a delta, so
+    the same events reappear poll after poll; seen_ids makes each event
+    count once — without it every repeated poll re-appends the same
+    entries to the errors list. A plain function over plain dicts: the
+    polling block runs every couple of seconds, and locals here are much
+    cheaper than repeated st.session_state proxy lookups.
+    """
+    for event in events[:5]:  # Check the most recent events
+        event_id = event.get("id")
+        if event_id is not None:
+            if event_id in seen_ids:
+                continue
+            seen_ids.add(event_id)
+        event_data = event.get("data", {})
+        if event_data.get("total_guides"):
+            progress["total_guides"] = event_data["total_guides"]
+        if event_data.get("processed_guides") is not None:
+            progress["processed_guides"] = event_data["processed_guides"]
+        if event_data.get("failed_guides") is not None:
+            progress["failed_guides"] = event_data["failed_guides"]
+        if event_data.get("total_chunks"):
+            progress["total_chunks"] = event_data["total_chunks"]
+        if event_data.get("current_guide"):
+            progress["current_guide"] = event_data["current_guide"]
+        if event_data.get("error"):
+            progress["errors"].append(event_data["error"])
+
+
 def fetch_run_details(run_id: str) -> dict:
     """Fetch detailed information about a specific run."""
     url = f"{_inngest_api_base()}/runs/{run_id}"
     try:
-        resp = requests.get(url)
+        resp = _http_session().get(url, timeout=5)
         resp.raise_for_status()
-        return resp.json()
+        return orjson.loads(resp.content)
     except Exception:
         return {}
 
@@ -97,20 +185,37 @@ def get_run_error_details(run: dict) -> str:
     return " | ".join(error_parts)
 
 
-def wait_for_run_output(event_id: str, timeout_s: float = 120.0, poll_interval_s: float = 0.5) -> dict:
+_SUCCESS_STATUSES = frozenset({"Completed", "Succeeded", "Success", "Finished"})
+_FAILED_STATUSES = frozenset({"Failed", "Cancelled"})
+TERMINAL_STATUSES = _SUCCESS_STATUSES | _FAILED_STATUSES
+
+
+def wait_for_run_output(event_id: str, timeout_s: float = 120.0,
+                        poll_interval_s: float = 0.1,
+                        max_interval_s: float = 2.0) -> dict:
+    """Poll until the run for an event finishes and return its output.
+
+    Polls with exponential backoff: fast at first so short runs are
+    detected within ~100ms, growing 1.5x up to max_interval_s so long
+    runs don't hammer the API. The interval resets whenever the run's
+    status changes.
+    """
     start = time.time()
     last_status = None
     run_id = None
+    interval = poll_interval_s
     while True:
-        runs = fetch_runs(event_id)
+        runs = _fetch_runs_uncached(event_id)
         if runs:
             run = runs[0]
             run_id = run.get("id")
             status = run.get("status")
-            last_status = status or last_status
-            if status in ("Completed", "Succeeded", "Success", "Finished"):
+            if status and status != last_status:
+                last_status = status
+                interval = poll_interval_s
+            if status in _SUCCESS_STATUSES:
                 return run.get("output") or {}
-            if status in ("Failed", "Cancelled"):
+            if status in _FAILED_STATUSES:
                 if run_id:
                     detailed_run = fetch_run_details(run_id)
                     if detailed_run:
@@ -121,7 +226,8 @@ def wait_for_run_output(event_id: str, timeout_s: float = 120.0, poll_interval_s
         if time.time() - start > timeout_s:
             raise TimeoutError(
                 f"Timed out waiting for run output (last status: {last_status})")
-        time.sleep(poll_interval_s)
+        time.sleep(interval)
+        interval = min(interval * 1.5, max_interval_s)
 
 
 async def send_rag_ingest_event(guide_id: int, token: str) -> str:
@@ -285,6 +391,9 @@ with tab2:
             button_text = "🚀 Start Site Ingestion" if st.session_state.site_resume_offset == 0 else f"▶️ Resume from Guide {st.session_state.site_resume_offset}"
             if st.button(button_text, use_container_width=True):
                 st.session_state.site_ingestion_active = True
+                fetch_runs.clear()
+                _fetch_site_progress_events.clear()
+                st.session_state._seen_progress_event_ids = set()
                 event_id = run_async(send_site_ingest_event(
                     st.session_state.dozuki_token,
                     site_id="hansaw",
@@ -296,12 +405,15 @@ with tab2:
         else:
             if st.button("⏸️ Pause Ingestion", use_container_width=True):
                 run_async(send_pause_event("hansaw"))
+                fetch_runs.clear()
+                _fetch_site_progress_events.clear()
                 st.session_state.site_ingestion_active = False
                 st.warning(
                     "Pausing ingestion... The current guide will complete before stopping.")
 
     # Progress tracking
-    if st.session_state.site_ingestion_active and st.session_state.site_ingestion_event_id:
+    ss = st.session_state
+    if ss.site_ingestion_active and ss.site_ingestion_event_id:
         progress_container = st.container()
 
         with progress_container:
@@ -313,53 +425,36 @@ with tab2:
             error_placeholder = st.empty()
 
             # Initialize progress state
-            if "site_progress" not in st.session_state:
-                st.session_state.site_progress = {
-                    "total_guides": 0,
-                    "processed_guides": 0,
-                    "failed_guides": 0,
-                    "total_chunks": 0,
-                    "current_guide": "",
-                    "errors": []
-                }
+            progress = ss.setdefault("site_progress", {
+                "total_guides": 0,
+                "processed_guides": 0,
+                "failed_guides": 0,
+                "total_chunks": 0,
+                "current_guide": "",
+                "errors": []
+            })
 
             # Poll for run status and progress
             try:
-                runs = fetch_runs(st.session_state.site_ingestion_event_id)
+                runs = fetch_runs(ss.site_ingestion_event_id)
                 if runs:
                     run = runs[0]
                     status = run.get("status", "Unknown")
 
-                    # Check Inngest events for progress updates
-                    events_url = f"{_inngest_api_base()}/events?name=rag/site_progress"
-                    try:
-                        resp = requests.get(events_url)
-                        if resp.status_code == 200:
-                            events = resp.json().get("data", [])
-                            # Process recent progress events
-                            for event in events[:10]:  # Check last 10 events
-                                event_data = event.get("data", {})
-                                if event_data.get("site_id") == "hansaw":
-                                    # Update progress state
-                                    if event_data.get("total_guides"):
-                                        st.session_state.site_progress["total_guides"] = event_data["total_guides"]
-                                    if event_data.get("processed_guides") is not None:
-                                        st.session_state.site_progress["processed_guides"] = event_data["processed_guides"]
-                                    if event_data.get("failed_guides") is not None:
-                                        st.session_state.site_progress["failed_guides"] = event_data["failed_guides"]
-                                    if event_data.get("total_chunks"):
-                                        st.session_state.site_progress["total_chunks"] = event_data["total_chunks"]
-                                    if event_data.get("current_guide"):
-                                        st.session_state.site_progress["current_guide"] = event_data["current_guide"]
-                                    if event_data.get("error"):
-                                        st.session_state.site_progress["errors"].append(
-                                            event_data["error"])
-                    except:
-                        pass  # Ignore event fetch errors
+                    # Check Inngest events for progress updates; a terminal
+                    # run's final numbers come from its output, so skip the
+                    # extra round-trip once the run has finished
+                    if status not in TERMINAL_STATUSES:
+                        try:
+                            _apply_progress_events(
+                                _fetch_site_progress_events("hansaw"),
+                                progress,
+                                ss.setdefault(
+                                    "_seen_progress_event_ids", set()))
+                        except:
+                            pass  # Ignore event fetch errors
 
                     # Display current progress
-                    progress = st.session_state.site_progress
-
                     if progress["total_guides"] > 0:
                         progress_pct = progress["processed_guides"] / \
                             progress["total_guides"]
@@ -379,10 +474,10 @@ with tab2:
                             f"📖 Processing: {progress['current_guide']}")
 
                     # Check if completed
-                    if status in ("Completed", "Succeeded", "Success", "Finished"):
+                    if status in _SUCCESS_STATUSES:
                         output = run.get("output", {})
-                        st.session_state.site_ingestion_active = False
-                        st.session_state.site_resume_offset = 0  # Reset for next run
+                        ss.site_ingestion_active = False
+                        ss.site_resume_offset = 0  # Reset for next run
 
                         # Display final stats
                         status_placeholder.success(
@@ -410,33 +505,33 @@ with tab2:
                                         f"Guide {err['guide_id']} ({err['title']}): {err['error']}")
 
                         # Clear progress state
-                        if "site_progress" in st.session_state:
-                            del st.session_state.site_progress
+                        if "site_progress" in ss:
+                            del ss["site_progress"]
 
-                    elif status in ("Failed", "Cancelled"):
-                        st.session_state.site_ingestion_active = False
+                    elif status in _FAILED_STATUSES:
+                        ss.site_ingestion_active = False
                         status_placeholder.error("❌ Site ingestion failed!")
                         error_message = get_run_error_details(run)
                         error_placeholder.error(f"Error: {error_message}")
 
                         # Clear progress state
-                        if "site_progress" in st.session_state:
-                            del st.session_state.site_progress
+                        if "site_progress" in ss:
+                            del ss["site_progress"]
 
                     elif output := run.get("output"):
                         # Check if paused
                         if output.get("status") == "paused":
-                            st.session_state.site_ingestion_active = False
-                            st.session_state.site_resume_offset = output.get(
+                            ss.site_ingestion_active = False
+                            ss.site_resume_offset = output.get(
                                 "resume_offset", 0)
                             status_placeholder.warning(
                                 "⏸️ Site ingestion paused")
                             st.info(
-                                f"Processed {output.get('processed_guides', 0)} guides. You can resume from guide {st.session_state.site_resume_offset}.")
+                                f"Processed {output.get('processed_guides', 0)} guides. You can resume from guide {ss.site_resume_offset}.")
 
                             # Clear progress state
-                            if "site_progress" in st.session_state:
-                                del st.session_state.site_progress
+                            if "site_progress" in ss:
+                                del ss["site_progress"]
 
                     else:
                         # Still running
@@ -448,12 +543,12 @@ with tab2:
                         st.rerun()
 
             except Exception as e:
-                st.session_state.site_ingestion_active = False
+                ss.site_ingestion_active = False
                 error_placeholder.error(f"Error tracking progress: {str(e)}")
 
                 # Clear progress state
-                if "site_progress" in st.session_state:
-                    del st.session_state.site_progress
+                if "site_progress" in ss:
+                    del ss["site_progress"]
 
 # Development Tab
 with tab3:
@@ -551,6 +646,9 @@ with tab3:
 
         doc_count = get_document_count()
         st.metric("Total Documents in Vector DB", doc_count)
+        if st.button("🔄 Refresh Count"):
+            get_document_count.clear()
+            st.rerun()
 
         st.divider()
 
@@ -574,7 +672,7 @@ with tab3:
             if st.button("🧪 Test Inngest Connection"):
                 try:
                     url = f"{_inngest_api_base()}/events"
-                    resp = requests.get(url)
+                    resp = _http_session().get(url, timeout=5)
                     if resp.status_code == 200:
                         st.success(
                             f"✅ Connection successful! (Status: {resp.status_code})")
@@ -587,23 +685,28 @@ with tab3:
         with col2:
             if st.button("📊 Check Vector DB Status"):
                 try:
-                    with QdrantStorage() as storage:
-                        count = storage.count()
-                        st.success(
-                            f"✅ Vector DB is accessible with {count} documents")
+                    count = _qdrant_storage().count()
+                    st.success(
+                        f"✅ Vector DB is accessible with {count} documents")
                 except Exception as e:
                     st.error(f"❌ Vector DB error: {str(e)}")
 
 
+# Compiled once: each handler classifies the message in a single C-level
+# scan instead of several substring checks plus a .lower() copy.
+_THROTTLE_RE = re.compile(r"ThrottlingException|\b429\b|quota", re.IGNORECASE)
+_AUTH_RE = re.compile(r"AccessDeniedException|\b401\b")
+
+
 def handle_ingestion_error(e: Exception):
     """Handle errors during ingestion with appropriate messages."""
     error_msg = str(e)
     st.error(f"❌ Ingestion failed: {error_msg}")
 
-    if "ThrottlingException" in error_msg or "429" in error_msg or "quota" in error_msg.lower():
+    if _THROTTLE_RE.search(error_msg):
         st.warning(
             "💡 **AWS Bedrock rate limit exceeded.** Please check your AWS account quotas.")
-    elif "AccessDeniedException" in error_msg or "401" in error_msg:
+    elif _AUTH_RE.search(error_msg):
         st.warning(
             "💡 **Authentication error.** Please verify your AWS credentials.")
 
@@ -616,10 +719,10 @@ def handle_query_error(e: Exception):
     error_msg = str(e)
     st.error(f"❌ Query failed: {error_msg}")
 
-    if "ThrottlingException" in error_msg or "429" in error_msg:
+    if _THROTTLE_RE.search(error_msg):
         st.warning(
             "💡 **AWS Bedrock rate limit exceeded.** Try again in a few moments.")
-    elif "AccessDeniedException" in error_msg or "401" in error_msg:
+    elif _AUTH_RE.search(error_msg):
         st.warning(
             "💡 **Authentication error.** Please verify your AWS credentials.")
 
@@ -637,8 +740,8 @@ with st.container():
         if st.button("🗑️ Clear All Data"):
             with st.spinner("Clearing database..."):
                 try:
-                    with QdrantStorage() as storage:
-                        storage.clear_all()
+                    _qdrant_storage().clear_all()
+                    get_document_count.clear()
                     st.session_state.ingested_guides = []
                     st.session_state.site_resume_offset = 0
                     st.success("✅ Database cleared and reset successfully!")
@@ -1,37 +1,203 @@
+import os
 from typing import Optional
 from qdrant_client import QdrantClient
 from qdrant_client.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
     Distance,
     FieldCondition,
     Filter,
     MatchValue,
-    PointStruct,
+    PayloadSchemaType,
+    QuantizationSearchParams,
+    QueryRequest,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
     VectorParams,
 )
 
+# Quantization keeps a smaller RAM-resident index (4x for int8, 32x for
+# binary); searches rescore candidates against the full-precision vectors
+# to preserve accuracy. QDRANT_QUANTIZATION: scalar (default), binary, none.
+QDRANT_QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "scalar").strip().lower()
+
+
+def _quantization_config():
+    if QDRANT_QUANTIZATION == "binary":
+        return BinaryQuantization(
+            binary=BinaryQuantizationConfig(always_ram=True)
+        )
+    if QDRANT_QUANTIZATION in ("none", "off"):
+        return None
+    return ScalarQuantization(
+        scalar=ScalarQuantizationConfig(
+            type=ScalarType.INT8,
+            always_ram=True,
+            quantile=0.99,
+        )
+    )
+
+
+_QUANTIZATION_CONFIG = _quantization_config()
+
+_SEARCH_PARAMS = SearchParams(
+    quantization=QuantizationSearchParams(rescore=True, oversampling=2.0)
+)
+
+# Only the payload fields _format_results actually reads; anything else
+# stored with the points would be serialized and shipped per hit for
+# nothing.
+_SEARCH_PAYLOAD_FIELDS = [
+    "text",
+    "source",
+    "guide_id",
+    "guide_title",
+    "guide_url",
+    "images",
+]
+
+
+def _format_results(results) -> dict:
+    """Shape scored points into the contexts/sources/... result dict.
+
+    Hot path for batched search: one pass per hit with the payload bound
+    once and no speculative type checks — the ingest code controls the
+    payload shape, so images is always a list of URL strings.
+    """
+    contexts = []
+    # dict keys dedup in one hash pass while keeping rank order, unlike
+    # a set() + list() round-trip
+    sources: dict = {}
+    guide_ids: dict = {}
+    images_per_context = []
+    guide_info = []
+
+    for r in results:
+        payload = r.payload or {}
+        get = payload.get
+        text = get("text", "")
+        if not text:
+            continue
+        source = get("source", "")
+        guide_id = get("guide_id")
+        contexts.append(text)
+        sources[source] = None
+        if guide_id:
+            guide_ids[guide_id] = None
+        # collect per-result guide meta
+        guide_info.append({
+            "guide_id": guide_id,
+            "title": get("guide_title"),
+            "url": get("guide_url"),
+            "source": source,
+        })
+        images = get("images") or ()
+        images_per_context.append([u for u in images if u])
+
+    return {
+        "contexts": contexts,
+        "sources": list(sources),
+        "guide_ids": list(guide_ids),
+        "images_per_context": images_per_context,
+        "guide_info": guide_info,
+    }
+
+
+# gRPC skips JSON serialization and HTTP/1.1 overhead on every call;
+# opt out with QDRANT_PREFER_GRPC=false if only the REST port is exposed
+QDRANT_PREFER_GRPC = os.getenv(
+    "QDRANT_PREFER_GRPC", "true").strip().lower() in ("1", "true", "yes", "y")
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+
+# Page size for the list-guides scroll fallback; per-call overhead is
+# fixed, so bigger pages mean proportionally fewer round-trips.
+QDRANT_SCROLL_PAGE_SIZE = int(os.getenv("QDRANT_SCROLL_PAGE_SIZE", "4096"))
+
+# Collections whose existence has already been verified; ensure_collection
+# consults this so the collection_exists round-trip happens at most once
+# per process per collection, not once per QdrantStorage construction.
+_COLLECTION_READY: set[str] = set()
+
 
 class QdrantStorage:
     def __init__(self, url="http://localhost:6333", collection="docs", dim=1024):
-        self.client = QdrantClient(url=url, timeout=30)
+        self.client = QdrantClient(
+            url=url,
+            prefer_grpc=QDRANT_PREFER_GRPC,
+            grpc_port=QDRANT_GRPC_PORT,
+            timeout=30,
+        )
         self.collection = collection
+        self.dim = dim
+
+    def ensure_collection(self):
+        """Create the collection and payload index if they don't exist.
+
+        Invoked lazily from each entry point instead of __init__, and
+        memoized in _COLLECTION_READY, so constructing a client — which
+        happens on every Streamlit rerun and ingest step — never pays a
+        collection_exists round-trip after the first call. Read paths
+        call it too so a fresh Qdrant instance degrades gracefully
+        (empty search, zero count) instead of erroring.
+        """
+        if self.collection in _COLLECTION_READY:
+            return
         if not self.client.collection_exists(self.collection):
             self.client.create_collection(
                 collection_name=self.collection,
                 vectors_config=VectorParams(
-                    size=dim, distance=Distance.COSINE),
+                    size=self.dim, distance=Distance.COSINE),
+                quantization_config=_QUANTIZATION_CONFIG,
             )
+        self._ensure_guide_id_index()
+        _COLLECTION_READY.add(self.collection)
 
-    def upsert(self, ids, vectors, payloads):
-        points = [PointStruct(id=ids[i], vector=vectors[i],
-                              payload=payloads[i]) for i in range(len(ids))]
-        self.client.upsert(self.collection, points=points)
+    def _ensure_guide_id_index(self):
+        # Index guide_id so filtered searches and the facet aggregation
+        # in list_guides stay sublinear; idempotent on existing collections.
+        try:
+            self.client.create_payload_index(
+                collection_name=self.collection,
+                field_name="guide_id",
+                field_schema=PayloadSchemaType.INTEGER,
+            )
+        except Exception:
+            pass
 
-    def search(
+    def upsert(self, ids, vectors, payloads, wait: bool = False):
+        """Bulk-upload points; accepts a 2-D numpy array or list of vectors.
+
+        upload_collection batches client-side and, with wait=False, lets
+        the server acknowledge before indexing so large ingests are not
+        throttled by constant index rebuilds. Parallel upload workers
+        only pay off (and only spawn) for site-scale batches.
+        """
+        self.ensure_collection()
+        self.client.upload_collection(
+            collection_name=self.collection,
+            ids=list(ids),
+            vectors=vectors,
+            payload=payloads,
+            batch_size=256,
+            parallel=(os.cpu_count() or 4) if len(ids) > 1024 else 1,
+            wait=wait,
+        )
+
+    def search_batch(
         self,
-        query_vector,
+        query_vectors,
         top_k: int = 5,
         guide_id: Optional[int] = None
-    ):
+    ) -> list[dict]:
+        """Search several query vectors in one server round-trip.
+
+        The server parallelizes the HNSW traversals and the client pays
+        network overhead once instead of per vector; the guide filter is
+        shared across all requests.
+        """
+        self.ensure_collection()
         query_filter = None
         if guide_id is not None:
             query_filter = Filter(
@@ -43,52 +209,97 @@ class QdrantStorage:
                 ]
             )
 
-        results = self.client.search(
+        requests = [
+            QueryRequest(
+                query=vec.tolist() if hasattr(vec, "tolist") else vec,
+                filter=query_filter,
+                params=_SEARCH_PARAMS,
+                with_payload=_SEARCH_PAYLOAD_FIELDS,
+                limit=top_k,
+            )
+            for vec in query_vectors
+        ]
+        responses = self.client.query_batch_points(
+            collection_name=self.collection,
+            requests=requests,
+        )
+        return [_format_results(response.points) for response in responses]
+
+    def search(
+        self,
+        query_vector,
+        top_k: int = 5,
+        guide_id: Optional[int] = None
+    ):
+        return self.search_batch([query_vector], top_k, guide_id)[0]
+
+    def get_source_content_hash(self, source_id: str) -> Optional[str]:
+        """Return the content_hash stored with a source's points, if any."""
+        self.ensure_collection()
+        points, _ = self.client.scroll(
             collection_name=self.collection,
-            query_vector=query_vector,
-            query_filter=query_filter,
-            with_payload=True,
-            limit=top_k
+            scroll_filter=Filter(
+                must=[
+                    FieldCondition(
+                        key="source",
+                        match=MatchValue(value=source_id)
+                    )
+                ]
+            ),
+            with_vectors=False,
+            with_payload=["content_hash"],
+            limit=1,
         )
-        contexts = []
-        sources = set()
-        guide_ids = set()
-        images_per_context = []
-        guide_info = []
-
-        for r in results:
-            payload = getattr(r, "payload", None) or {}
-            text = payload.get("text", "")
-            source = payload.get("source", "")
-            guide_id = payload.get("guide_id")
-            images = payload.get("images") or []
-            if text:
-                contexts.append(text)
-                sources.add(source)
-                if guide_id:
-                    guide_ids.add(guide_id)
-                # collect per-result guide meta
-                guide_info.append({
-                    "guide_id": guide_id,
-                    "title": payload.get("guide_title"),
-                    "url": payload.get("guide_url"),
-                    "source": source,
-                })
-                # ensure list[str]
-                if isinstance(images, list):
-                    images_per_context.append([str(u) for u in images if u])
-                else:
-                    images_per_context.append([])
-
-        return {
-            "contexts": contexts,
-            "sources": list(sources),
-            "guide_ids": list(guide_ids),
-            "images_per_context": images_per_context,
-            "guide_info": guide_info,
-        }
+        if not points:
+            return None
+        payload = getattr(points[0], "payload", None) or {}
+        return payload.get("content_hash")
 
     def list_guides(self) -> list[dict]:
+        """Distinct guides in the collection, with one source per guide.
+
+        The facet API aggregates distinct guide_id values server-side in
+        a single request instead of scrolling every point's payload over
+        the wire; one limit-1 filtered scroll per guide then recovers the
+        source field. Falls back to the full scan if faceting is not
+        available (older server, missing index).
+        """
+        self.ensure_collection()
+        try:
+            facets = self.client.facet(
+                collection_name=self.collection,
+                key="guide_id",
+                limit=10_000,
+            )
+        except Exception:
+            return self._list_guides_scan()
+
+        guides = []
+        for hit in facets.hits:
+            guide_id = hit.value
+            points, _ = self.client.scroll(
+                collection_name=self.collection,
+                scroll_filter=Filter(
+                    must=[
+                        FieldCondition(
+                            key="guide_id",
+                            match=MatchValue(value=guide_id)
+                        )
+                    ]
+                ),
+                with_vectors=False,
+                with_payload=["source"],
+                limit=1,
+            )
+            payload = (points[0].payload or {}) if points else {}
+            guides.append({
+                "guide_id": guide_id,
+                "source": payload.get("source"),
+            })
+
+        return sorted(guides, key=lambda item: item["guide_id"])
+
+    def _list_guides_scan(self) -> list[dict]:
         guides: dict[int, dict] = {}
         offset = None
 
@@ -97,8 +308,8 @@ class QdrantStorage:
                 collection_name=self.collection,
                 offset=offset,
                 with_vectors=False,
-                with_payload=True,
-                limit=256,
+                with_payload=["guide_id", "source"],
+                limit=QDRANT_SCROLL_PAGE_SIZE,
             )
 
             for point in points:
@@ -119,6 +330,7 @@ class QdrantStorage:
         return sorted(guides.values(), key=lambda item: item["guide_id"])
 
     def count(self) -> int:
+        self.ensure_collection()
         collection_info = self.client.get_collection(self.collection)
         return collection_info.points_count
 
@@ -126,8 +338,11 @@ class QdrantStorage:
         self.client.recreate_collection(
             collection_name=self.collection,
             vectors_config=VectorParams(
-                size=1024, distance=Distance.COSINE),
+                size=self.dim, distance=Distance.COSINE),
+            quantization_config=_QUANTIZATION_CONFIG,
         )
+        self._ensure_guide_id_index()
+        _COLLECTION_READY.add(self.collection)
 
     def close(self):
         self.client.close()